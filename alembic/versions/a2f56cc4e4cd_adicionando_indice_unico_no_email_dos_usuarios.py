@@ -0,0 +1,28 @@
+"""Adicionando indice unico no email dos usuarios
+
+Revision ID: a2f56cc4e4cd
+Revises: dd95123f2d48
+Create Date: 2026-10-15 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2f56cc4e4cd'
+down_revision: Union[str, Sequence[str], None] = 'dd95123f2d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.create_index('ix_users_email', ['email'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_index('ix_users_email')
@@ -0,0 +1,34 @@
+"""Adicionando indices nas chaves estrangeiras
+
+Revision ID: e3b350beed9b
+Revises: a2f56cc4e4cd
+Create Date: 2026-10-15 10:41:07.552914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b350beed9b'
+down_revision: Union[str, Sequence[str], None] = 'a2f56cc4e4cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.create_index('ix_orders_usuario', ['usuario'], unique=False)
+
+    with op.batch_alter_table('order_items') as batch_op:
+        batch_op.create_index('ix_order_items_pedido', ['pedido'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('order_items') as batch_op:
+        batch_op.drop_index('ix_order_items_pedido')
+
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_index('ix_orders_usuario')
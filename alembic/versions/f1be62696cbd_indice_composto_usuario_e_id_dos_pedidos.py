@@ -0,0 +1,30 @@
+"""Indice composto usuario e id dos pedidos
+
+Revision ID: f1be62696cbd
+Revises: e3b350beed9b
+Create Date: 2026-10-15 11:47:19.604853
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1be62696cbd'
+down_revision: Union[str, Sequence[str], None] = 'e3b350beed9b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.create_index('ix_orders_usuario_id', ['usuario', sa.text('id DESC')], unique=False)
+        batch_op.drop_index('ix_orders_usuario')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.create_index('ix_orders_usuario', ['usuario'], unique=False)
+        batch_op.drop_index('ix_orders_usuario_id')
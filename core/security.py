@@ -1,4 +1,6 @@
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from fastapi.security import OAuth2PasswordBearer
 # Importando a ferramenta para criptografar as senhas dos usuarios.
 from passlib.context import CryptContext
@@ -14,16 +16,49 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 # Algoritimo do jwt token
 ALGORITHM_TOKEN = os.getenv("JWT_ALGORITHM")
 
+# Lista de algoritimos aceitos na decodificação do token, criada uma vez para não ser montada a cada requisição
+ALGORITHMS_LIST = [ALGORITHM_TOKEN]
+
 # Minutos de expiração do token e transformando em inteiro para usar na função de criação do jwt token
 # de expiração de data
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
+# Custo (rounds) do bcrypt, cada round a mais dobra o tempo de hash e de verificação da senha.
+# O padrão do passlib é 12, que deixa o login lento. Usando 10 como padrão, configuravel pela env BCRYPT_ROUNDS
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+
 # Criando a variavel para criar a varaivel que vai verificar se a senha é igual a senha criptografada no db
 # deprecated="auto" é usado para o CryptContext sempre buscar o esquema mais atualziado para criptografia
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Os hashes antigos (com outro custo) continuam sendo verificados normalmente, pois o custo fica salvo no proprio hash
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 # Criando a variavel oauth2_schema como um esquema da autenticação oauth2 para
 # funcionar o refresh token, tendo em vista que oauth2 usa o esquema de
 # "Bearer token" dentro do headers, então precisamos adicionar o token como um Depends
 # da função que usa o refresh token para gerar um novo access token
-oauth2_schema = OAuth2PasswordBearer(tokenUrl="autenticacao/login-form")
\ No newline at end of file
+oauth2_schema = OAuth2PasswordBearer(tokenUrl="autenticacao/login-form")
+
+# Pool de processos usado para criptografar varias senhas em paralelo (cadastro em lote), ja que o bcrypt é pesado em CPU.
+# Ele é criado so no primeiro uso e reaproveitado nas proximas chamadas, e é encerrado quando a API desliga (lifespan).
+# Os processos sao iniciados com "spawn" em vez de "fork", para nao copiar as threads que a API ja tem rodando
+# (anyio, aiosqlite), e importam so este modulo para rodar o hash_senha.
+_hash_executor = None
+
+# Função usada pelos processos do pool para criptografar as senhas.
+# Precisa ser uma função do modulo (e nao o metodo do bcrypt_context) para poder ser enviada aos outros processos.
+def hash_senha(senha):
+    return bcrypt_context.hash(senha)
+
+# Função que retorna o pool de processos de criptografia, criando ele no primeiro uso
+def get_hash_executor():
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    return _hash_executor
+
+# Função que encerra o pool de processos de criptografia, chamada quando a API desliga
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
@@ -1,8 +1,20 @@
 # Este arquivo é usado para as dependencias que necessito para as rotas da minha API.
 import os
-from sqlalchemy.orm import sessionmaker, Session
-from core.security import (SECRET_KEY, ALGORITHM_TOKEN, bcrypt_context, oauth2_schema)
-from jose import jwt, JWTError
+import hashlib
+import time
+import anyio
+import asyncio
+from typing import NamedTuple
+from aiocache import Cache
+from aiocache.serializers import MsgPackSerializer
+from cachetools import TTLCache
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from core.security import (SECRET_KEY, ALGORITHMS_LIST, bcrypt_context, oauth2_schema)
+import jwt
+from jwt.exceptions import InvalidTokenError as JWTError
 from models.models import db
 from models.models import Usuario
 from fastapi import Depends, HTTPException
@@ -11,38 +23,71 @@ from fastapi import Depends, HTTPException
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
+# Criando a fabrica de sessões uma unica vez, ao importar o modulo, em vez de recriar o sessionmaker a cada requisição.
+# autoflush=False evita flushs automaticos antes de cada query, entao quando for preciso o flush é feito manualmente.
+# expire_on_commit=False evita que os objetos sejam expirados no commit e recarregados do banco com um novo SELECT.
+SessionLocal = async_sessionmaker(bind=db, autoflush=False, expire_on_commit=False)
+
+# Cache dos tokens JWT ja validados, a chave é o sha256 do token e o valor é {"sub": id do usuario, "exp": exp do token}.
+# Assim o mesmo token, que é reutilizado durante toda a sua validade, não precisa passar de novo pelo jwt.decode.
+# Se a env REDIS_URL estiver configurada, o cache fica no Redis e é compartilhado entre todos os workers da API,
+# se não, cada worker usa um TTLCache na propria memoria, onde 60 segundos é o tempo maximo que um token fica salvo.
+# Nos dois casos o exp do token é verificado a cada acesso para que um token nunca seja aceito depois de expirar.
+REDIS_URL = os.getenv("REDIS_URL")
+TOKEN_CACHE_TTL_SECONDS = 60
+_token_cache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL_SECONDS)
+_redis_token_cache = None
+if REDIS_URL:
+    _redis_token_cache = Cache.from_url(REDIS_URL)
+    _redis_token_cache.serializer = MsgPackSerializer()
+
+# Dados do usuario autenticado que as rotas usam, retornados pelo verify_token.
+# É uma tupla imutavel e independente da sessão do banco, entao pode ficar no cache e ser usada por varias requisições
+# ao mesmo tempo, sem ser expirada por um rollback da sessão que buscou o usuario.
+class UsuarioAutenticado(NamedTuple):
+    id: int
+    admin: bool
+    ativo: bool
+
+# Cache dos usuarios ja buscados pelo verify_token, a chave é o id do usuario (sub do token).
+# Um usuario fazendo varias requisições seguidas nao precisa ir ao banco em todas, so quando o cache expira.
+# Uma alteração no usuario (ex.: perder o admin ou ser desativado) so é vista depois de no maximo 30 segundos.
+USER_CACHE_TTL_SECONDS = 30
+_user_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL_SECONDS)
+
 # Função para pegar a sessão do banco de dados, retornar com yield para retornar mas não fehcar a função e no fim
 # independentemente se a funçao funcionou ou deu erro, ela fecha a sessao com o banco para não
-# gerar multiplas sessões abertas e congestionar o banco de dados
-def get_db_session():
-    try:
-        Session = sessionmaker(bind=db)
-        session = Session()
-
+# gerar multiplas sessões abertas e congestionar o banco de dados.
+# O FastAPI guarda o resultado da dependencia durante a requisição, entao o verify_token e a rota usam a mesma sessão
+# (e a mesma conexão do pool), em vez de pegar duas conexões por requisição.
+async def get_db_session():
+    # Usamos async with para garantir que a sessao sempre seja encerrada, mesmo se houver erro.
+    async with SessionLocal() as session:
         # Usando yield para a sessao retornar o valor mas nao encerrar a função
         yield session
-    # Usamos try finally para tratar se houver erro e garantir que a sessao sempre seja encerrada.
-    finally:
-        # no fim, encerrarmos a sessao com session.close()
-        session.close()
 
 # Função para criar o admin inicial
-def init_admin():
+async def init_admin():
     # Criando a sessão manualmente para o codigo de init admin.
-    Session = sessionmaker(bind=db)
-    session = Session()
-    try:
-        # Pegando o primeiro usuario do banco
-        existe_usuario = session.query(Usuario).first()
+    async with SessionLocal() as session:
+        # Verificando se existe algum usuario no banco com SELECT EXISTS,
+        # que retorna so um booleano sem carregar o usuario inteiro
+        existe_usuario = await session.scalar(select(select(Usuario).exists()))
 
         # Se existir, entao nao cria um novo usuario e retorna nada
         if existe_usuario:
             return
 
         # Se nao existir usuario, cria o usuario padrão ADM
-        senha_criptografada = bcrypt_context.hash(ADMIN_PASSWORD)
+        # O hash so é feito depois de confirmar que nao existe usuario, entao so roda no primeiro boot.
+        # Ele roda numa thread para nao travar o event loop
+        senha_criptografada = await anyio.to_thread.run_sync(bcrypt_context.hash, ADMIN_PASSWORD)
 
-        admin = Usuario(
+        # Usando INSERT ... ON CONFLICT DO NOTHING no email (que tem indice unico), assim se varios workers
+        # subirem ao mesmo tempo e todos tentarem criar o admin, so o primeiro insere e os outros nao dao erro.
+        # O insert com ON CONFLICT é especifico de cada banco, entao é escolhido de acordo com o dialeto da engine
+        insert = postgresql.insert if db.dialect.name == "postgresql" else sqlite.insert
+        query_insert_admin = insert(Usuario).values(
             nome="admin",
             email=ADMIN_EMAIL,
             senha=senha_criptografada,
@@ -50,35 +95,79 @@ def init_admin():
             sexo="admin",
             admin=True,
             ativo=True
-        )
+        ).on_conflict_do_nothing(index_elements=["email"])
 
-        session.add(admin)
-        session.commit()
+        resultado = await session.execute(query_insert_admin)
+        await session.commit()
 
-        print("✅ Usuário ADMIN criado com sucesso")
-    finally:
-        session.close()
+        if resultado.rowcount:
+            print("✅ Usuário ADMIN criado com sucesso")
 
 
 
-# Função para verificar se o token é valido para a rota de refresh, usando a sessao como Depend para
-# a conexao e verificação do banco. Usando o token como Depends para utilizar o token dentro dos headers e
-# usar o Bearer.
-def verify_token(token: str = Depends(oauth2_schema), session: Session = Depends(get_db_session)):
+# Função que valida o token JWT e retorna o id do usuario dono do token, consultando o cache antes de decodificar.
+# Somente tokens validos sao salvos no cache, tokens invalidos ou expirados nunca sao cacheados.
+async def get_or_verify(token: str):
+    # Chave do token no cache, usando o hash para não guardar o token em texto puro na memoria
+    chave_token = hashlib.sha256(token.encode()).hexdigest()
+
+    # O cache é so uma otimização: se o Redis estiver fora do ar, usa o cache em memoria em vez de derrubar a requisição
+    if _redis_token_cache:
+        try:
+            info_token = await _redis_token_cache.get(f"jwt:{chave_token[:32]}")
+        except (RedisError, OSError, asyncio.TimeoutError):
+            info_token = _token_cache.get(chave_token)
+    else:
+        info_token = _token_cache.get(chave_token)
+
+    # Se o token ja foi validado e ainda não expirou, pula a decodificação do JWT
+    if info_token and info_token["exp"] > time.time():
+        return info_token["sub"]
+
     # Tentando fazer a decodificação do token JWT enviado fazendo o processo reverso ao de codificação dos dados.
     try:
         # Pegando o dicionario de informações sobre o token JWT
-        dict_info = jwt.decode(token=token, key=SECRET_KEY, algorithms=ALGORITHM_TOKEN)
+        dict_info = jwt.decode(token, key=SECRET_KEY, algorithms=ALGORITHMS_LIST)
 
         # Pegando o id do usuario para pegar o usuario
         id_usuario = int(dict_info.get("sub"))
     except JWTError as jwt_error:
         raise HTTPException(status_code=401, detail="Acesso Negado, verifique a validade do token")
 
+    # Tokens sem data de expiração nao sao cacheados
+    exp = dict_info.get("exp")
+    if exp:
+        info_token = {"sub": id_usuario, "exp": exp}
+        if _redis_token_cache:
+            # No Redis o TTL é o tempo que falta para o token expirar
+            try:
+                await _redis_token_cache.set(f"jwt:{chave_token[:32]}", info_token, ttl=max(int(exp - time.time()), 1))
+            except (RedisError, OSError, asyncio.TimeoutError):
+                _token_cache[chave_token] = info_token
+        else:
+            _token_cache[chave_token] = info_token
+
+    return id_usuario
+
+
+# Função para verificar se o token é valido para a rota de refresh, usando a sessao como Depend para
+# a conexao e verificação do banco. Usando o token como Depends para utilizar o token dentro dos headers e
+# usar o Bearer.
+async def verify_token(token: str = Depends(oauth2_schema), session: AsyncSession = Depends(get_db_session)):
     # Verificar se o token é valido
     # Se o token for valido, essa função extrai o id do usuario desse token.
-    usuario = session.query(Usuario).filter(Usuario.id == id_usuario).first()
-    if not usuario:
-        raise HTTPException(status_code=401, detail="Acesso Invalido")
+    id_usuario = await get_or_verify(token)
+
+    # Procurando o usuario primeiro no cache, so vai ao banco se ele nao estiver la
+    usuario = _user_cache.get(id_usuario)
+    if usuario is None:
+        # Buscando so as colunas usadas pelas rotas, sem criar um objeto do ORM preso a sessão
+        query_usuario = select(Usuario.id, Usuario.admin, Usuario.ativo).where(Usuario.id == id_usuario)
+        dados_usuario = (await session.execute(query_usuario)).first()
+        if not dados_usuario:
+            raise HTTPException(status_code=401, detail="Acesso Invalido")
+
+        usuario = UsuarioAutenticado(*dados_usuario)
+        _user_cache[id_usuario] = usuario
 
-    return usuario
\ No newline at end of file
+    return usuario
@@ -1,58 +1,69 @@
 import os
+import hashlib
+from contextlib import asynccontextmanager
 from dependencies import init_admin
-from fastapi import FastAPI, Request
-from fastapi.security import OAuth2PasswordBearer
+from core.security import shutdown_hash_executor
+from models.models import db
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 
-# Importando a ferramenta para criptografar as senhas dos usuarios.
-from passlib.context import CryptContext
+# Importando as rotas do sistema. As envs ja sao carregadas pelo core/security.py
+from routes.autenticacao_rotas import autenticacao_rota
+from routes.pedidos_rotas import pedidos_rota
 
-# Carregando as envs e buscando a secret key com 'os'
-from dotenv import load_dotenv
+# Subir a API: uvicorn main:app --reload
 
-load_dotenv()
+# Ciclo de vida da aplicação, o codigo antes do yield roda quando a API sobe e o depois do yield quando ela desliga.
+# Criando o admin inicial para usar aplicação em produção. O init_admin é assincrono e faz o hash
+# do bcrypt numa thread, entao nao trava o event loop. Com varios workers, a env SKIP_INIT_ADMIN=true
+# pode ser usada nos workers que nao precisam tentar criar o admin.
+# A pagina HOME nao muda entre as requisições, entao ela é renderizada uma unica vez aqui junto com o seu ETag.
+# O ETag é fraco (W/) porque o GZipMiddleware pode servir a mesma pagina comprimida ou nao, e um ETag forte
+# so pode identificar uma unica representação da resposta.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("SKIP_INIT_ADMIN", "false").lower() != "true":
+        await init_admin()
+    app.state.home_html = templates.get_template("index.html").render({"request": None})
+    app.state.home_etag = f'W/"{hashlib.md5(app.state.home_html.encode()).hexdigest()}"'
+    yield
+    # Fechando as conexões do pool do banco quando a API desliga
+    await db.dispose()
+    # Encerrando os processos do pool de criptografia de senhas, se ele chegou a ser criado
+    shutdown_hash_executor()
 
-# Subir a API: uvicorn main:app --reload
+# Usando o orjson para escrever as respostas JSON de todas as rotas, ele é mais rapido que o json padrão do Python
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
-app = FastAPI()
+# Comprimindo com gzip as respostas maiores que 1KB (listas de pedidos em JSON, paginas HTML) quando o cliente aceita,
+# as respostas pequenas nao compensam o custo da compressão
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-# Criando o admin inicial para usar aplicação em produção
-@app.on_event("startup")
-def startup_event():
-    init_admin()
+# Adicionando as rotas do sistema no aplicativo!
+app.include_router(autenticacao_rota)
+app.include_router(pedidos_rota)
 
 # Criando a pasta de templates do jinja
 templates = Jinja2Templates(directory="templates")
 
 
-# # Criando a variavel para criar a varaivel que vai verificar se a senha é igual a senha criptografada no db
-# # deprecated="auto" é usado para o CryptContext sempre buscar o esquema mais atualziado para criptografia
-# bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-#
-# # Criando a variavel oauth2_schema como um esquema da autenticação oauth2 para
-# # funcionar o refresh token, tendo em vista que oauth2 usa o esquema de
-# # "Bearer token" dentro do headers, então precisamos adicionar o token como um Depends
-# # da função que usa o refresh token para gerar um novo access token
-# oauth2_schema = OAuth2PasswordBearer(tokenUrl="autenticacao/login-form")
-
-# Importando e adicionando as rotas do sistema no aplicativo!
-from routes.autenticacao_rotas import autenticacao_rota
-from routes.pedidos_rotas import pedidos_rota
-
-app.include_router(autenticacao_rota)
-app.include_router(pedidos_rota)
-
 # Rota principal do aplicativo com as informações da API
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """
         Rota HOME da API.
 
-        Renderiza a página inicial contendo a documentação geral do sistema,
+        Retorna a página inicial contendo a documentação geral do sistema,
         descrição das funcionalidades e informações sobre as rotas disponíveis.
+        O HTML ja renderizado na subida da API é servido com ETag e Cache-Control,
+        e se o cliente ja tiver a versão atual a resposta é um 304 sem corpo.
     """
-    return templates.TemplateResponse(
-        "index.html",
-        {"request": request}
-    )
\ No newline at end of file
+    headers = {"ETag": request.app.state.home_etag, "Cache-Control": "public, max-age=3600"}
+
+    # Se o ETag enviado pelo cliente for o mesmo, ele ja tem a pagina atualizada
+    if request.headers.get("if-none-match") == request.app.state.home_etag:
+        return Response(status_code=304, headers=headers)
+
+    return HTMLResponse(request.app.state.home_html, headers=headers)
\ No newline at end of file
@@ -1,14 +1,18 @@
+import anyio
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
 from models.models import Usuario
-from dependencies import get_db_session, verify_token
-from core.security import (SECRET_KEY, ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM_TOKEN, bcrypt_context)
+from dependencies import get_db_session, verify_token, UsuarioAutenticado
+from core.security import (SECRET_KEY, ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM_TOKEN, bcrypt_context, get_hash_executor, hash_senha)
 from schemas.schemas import UsuarioSchema, LoginSchema
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, timezone
 from fastapi.security import OAuth2PasswordRequestForm
 
-# Usando python-jose para autenticaçao com JWT
-from jose import jwt
+# Usando PyJWT para autenticaçao com JWT
+import jwt
 
 SUCCESSFULL_AUTH_USER_MESSAGE = "Usuario Autenticado!"
 INVALID_PWD_MESSAGE = "Error: Usuario não encontrado ou senha invalida"
@@ -34,7 +38,7 @@ def create_token_jwt(id_usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EX
             str: Token JWT codificado contendo as informações do usuário e a data de expiração.
 
         Raises:
-            JWTError: Caso ocorra algum erro durante a codificação do token.
+            jwt.PyJWTError: Caso ocorra algum erro durante a codificação do token.
     """
     # Criando token JWT para não usar email e senha explicitamente
     # Criando uma data de expiração do token de acordo com os minutos de expiração
@@ -49,7 +53,7 @@ def create_token_jwt(id_usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EX
     # Variavel de jwt codificado
     # Passando o dicionario, a chave de codificação das senhas e o tipo de algoritimo usado no JWT
     encoded_jwt = jwt.encode(
-        claims=dict_info,
+        payload=dict_info,
         key=SECRET_KEY,
         algorithm=ALGORITHM_TOKEN
     )
@@ -58,37 +62,90 @@ def create_token_jwt(id_usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EX
 
 
 # Função para autenticar o usuario
-def authentic_user(email, senha, session):
+async def authentic_user(email, senha, session):
     """
         Autentica um usuário com base no e-mail e na senha informados.
 
         A função realiza a busca do usuário no banco de dados utilizando o e-mail
-        e valida a senha fornecida comparando com o hash armazenado.
+        e valida a senha fornecida comparando com o hash armazenado. A verificação
+        do bcrypt é executada em uma thread separada para não bloquear o event loop.
         Caso as credenciais estejam incorretas ou o usuário não exista,
         a autenticação falha.
 
         Args:
             email (str): Endereço de e-mail do usuário a ser autenticado.
             senha (str): Senha em texto puro fornecida pelo usuário.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
 
         Returns:
-            Usuario | bool: Retorna o objeto Usuario quando a autenticação é bem-sucedida.
+            int | bool: Retorna o id do usuário quando a autenticação é bem-sucedida.
             Retorna False caso o usuário não exista ou a senha esteja incorreta.
     """
-    # Pegando o usuario no banco de acordo com o email
-    user = session.query(Usuario).filter(Usuario.email == email).first()
+    # Pegando somente o id e a senha do usuario no banco de acordo com o email,
+    # as outras colunas nao sao usadas no login
+    user = (await session.execute(select(Usuario.id, Usuario.senha).where(Usuario.email == email))).first()
 
     # Se o usuario nao existir, então ele retorna false
     if not user:
         return False
     # Se o usuario existir, ele verifica se a senha do usuario nao é igual a do banco.
-    elif not bcrypt_context.verify(secret=senha, hash=user.senha):
+    # O bcrypt gasta centenas de milissegundos de CPU, entao rodamos ele numa thread
+    # para o event loop continuar atendendo as outras requisições.
+    elif not await anyio.to_thread.run_sync(bcrypt_context.verify, senha, user.senha):
         # Retorna false se a senha estiver errada
         return False
 
-    # Retorna o usuario caso exista o email e a senha esteja certa
-    return user
+    # Retorna o id do usuario caso exista o email e a senha esteja certa
+    return user.id
+
+# Função para cadastrar varios usuarios de uma vez
+async def create_users_bulk(usuarios_schema, session):
+    """
+        Cadastra uma lista de usuários em lote.
+
+        As senhas são criptografadas em paralelo em um pool de processos, já que o
+        bcrypt é pesado em CPU, e todos os usuários são inseridos com um único
+        INSERT executemany, sem criar um objeto Usuario para cada linha.
+
+        Args:
+            usuarios_schema (list[UsuarioSchema]): Dados dos usuários validados pelo Pydantic.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+
+        Returns:
+            int: Quantidade de usuários cadastrados.
+
+        Raises:
+            IntegrityError: Caso algum e-mail da lista já esteja cadastrado.
+    """
+    if not usuarios_schema:
+        return 0
+
+    # Criptografando todas as senhas em paralelo no pool de processos compartilhado (um processo por nucleo da CPU),
+    # aguardando os resultados sem travar o event loop
+    loop = asyncio.get_running_loop()
+    executor = get_hash_executor()
+    senhas_criptografadas = await asyncio.gather(
+        *(loop.run_in_executor(executor, hash_senha, usuario.senha) for usuario in usuarios_schema)
+    )
+
+    novos_usuarios = [
+        {
+            "nome": usuario.nome,
+            "email": usuario.email,
+            "senha": senha_criptografada,
+            "telefone": usuario.telefone,
+            "sexo": usuario.sexo,
+            "admin": usuario.admin,
+            "ativo": usuario.ativo
+        }
+        for usuario, senha_criptografada in zip(usuarios_schema, senhas_criptografadas)
+    ]
+
+    # Passando a lista de dicionarios o SQLAlchemy faz um unico executemany para todas as linhas
+    await session.execute(insert(Usuario), novos_usuarios)
+    await session.commit()
+
+    return len(novos_usuarios)
 
 @autenticacao_rota.get(path="/", status_code=201)
 async def autenticacao():
@@ -99,7 +156,7 @@ async def autenticacao():
     return {"message": "rota de autenticacao"}
 
 @autenticacao_rota.post("/criar_conta")
-async def criar_conta(usuario_schema: UsuarioSchema, session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+async def criar_conta(usuario_schema: UsuarioSchema, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
         Cria uma nova conta de usuário no sistema.
 
@@ -110,8 +167,8 @@ async def criar_conta(usuario_schema: UsuarioSchema, session: Session = Depends(
 
         Args:
             usuario_schema (UsuarioSchema): Dados do usuário validados pelo Pydantic.
-            session (Session): Sessão ativa do SQLAlchemy.
-            usuario (Usuario): Usuário autenticado obtido a partir do token JWT.
+            session (AsyncSession): Sessão ativa do SQLAlchemy.
+            usuario (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
@@ -121,11 +178,12 @@ async def criar_conta(usuario_schema: UsuarioSchema, session: Session = Depends(
         Returns:
             dict: Mensagem de sucesso com o e-mail do usuário criado.
     """
-    # Query para buscar usuario com o email especificado.
+    # Query para verificar se existe usuario com o email especificado.
     # Caso não haja usuarios ele cria, se nao, retorna uma mensagem.
-    user = session.query(Usuario).filter(Usuario.email == usuario_schema.email).first()
+    # Usando SELECT EXISTS para o banco retornar so um booleano, sem montar o objeto Usuario
+    email_cadastrado = await session.scalar(select(select(Usuario).where(Usuario.email == usuario_schema.email).exists()))
 
-    if user:
+    if email_cadastrado:
         # Retornando um HTTPException para retornar codigo 400 e nao sempre 200 na rota
         raise HTTPException(status_code=400, detail=EMAIL_ALREADY_CREATED_MESSAGE)
 
@@ -139,7 +197,8 @@ async def criar_conta(usuario_schema: UsuarioSchema, session: Session = Depends(
     # Criando uma senha criptgrafada a partir da senha do usuario
     # usando a variavel bcrypt context do arquivo main, onde está configurada
     # toda o processo para criptografia da senha
-    senha_criptografada = bcrypt_context.hash(usuario_schema.senha)
+    # O hash roda numa thread para nao bloquear o event loop
+    senha_criptografada = await anyio.to_thread.run_sync(bcrypt_context.hash, usuario_schema.senha)
 
     # Criando um usuario/conta caso nao exista
     # Usando usuario_schema do Pydantic para validar o dado
@@ -149,13 +208,23 @@ async def criar_conta(usuario_schema: UsuarioSchema, session: Session = Depends(
     session.add(new_user)
 
     # Fazendo o commit (inserção no banco de dados)
-    session.commit()
+    # Se outra requisição cadastrou o mesmo email entre a verificação acima e o commit,
+    # o indice unico do email bloqueia a inserção e retornamos o mesmo erro 400.
+    # Outros erros de integridade nao sao de email repetido, entao continuam subindo como erro
+    try:
+        await session.commit()
+    except IntegrityError as integrity_error:
+        await session.rollback()
+        erro_banco = str(integrity_error.orig)
+        if "users.email" in erro_banco or "ix_users_email" in erro_banco:
+            raise HTTPException(status_code=400, detail=EMAIL_ALREADY_CREATED_MESSAGE)
+        raise
 
     return {"message": f"{USER_SUCCESSFULLY_CREATED} {usuario_schema.email}"}
 
 # Criando rota de login para autenticar usuarios para liberar acessos restritos somente a usuarios autenticados
 @autenticacao_rota.post("/login")
-async def login(login_schema: LoginSchema, session: Session = Depends(get_db_session)):
+async def login(login_schema: LoginSchema, session: AsyncSession = Depends(get_db_session)):
     """
         Autentica um usuário utilizando e-mail e senha.
 
@@ -165,7 +234,7 @@ async def login(login_schema: LoginSchema, session: Session = Depends(get_db_ses
 
         Args:
             login_schema (LoginSchema): Credenciais de login do usuário.
-            session (Session): Sessão ativa do SQLAlchemy.
+            session (AsyncSession): Sessão ativa do SQLAlchemy.
 
         Raises:
             HTTPException:
@@ -175,20 +244,20 @@ async def login(login_schema: LoginSchema, session: Session = Depends(get_db_ses
             dict: Tokens de autenticação (access e refresh), tipo do token
             e mensagem de sucesso.
     """
-    user = authentic_user(email=login_schema.email, senha=login_schema.senha, session=session)
-    if not user:
+    id_usuario = await authentic_user(email=login_schema.email, senha=login_schema.senha, session=session)
+    if not id_usuario:
         # Usuario nao cadastrado ou senha errada
         raise HTTPException(status_code=400, detail=INVALID_PWD_MESSAGE)
 
 
     # Usuario existe, entao criando access e refresh token para o usuario
-    access_token = create_token_jwt(id_usuario=user.id)
+    access_token = create_token_jwt(id_usuario=id_usuario)
 
     # Passando o parametro duracao_token para o refresh token como sendo 7 dias.
     # esse parametro por padrao é o valor padrao de ACCESS_TOKEN_EXPIRE_MINUTES na .env
     # Ou seja, a cada 7 dias é preciso logar novamente no sistema e pegar o access_token
     # Mas durante os 7 dias, voce pode usar o refresh token para pegar o access token
-    refresh_token = create_token_jwt(id_usuario=user.id, duracao_token=timedelta(days=7))
+    refresh_token = create_token_jwt(id_usuario=id_usuario, duracao_token=timedelta(days=7))
 
     return {
         "message": SUCCESSFULL_AUTH_USER_MESSAGE,
@@ -202,7 +271,7 @@ async def login(login_schema: LoginSchema, session: Session = Depends(get_db_ses
 # dentro da documentacao da api. Transformando essa variavel em Depends vazio, porque a dependencia é preenchida
 # automaticamente pelo fastapi.
 @autenticacao_rota.post("/login-form")
-async def login_form(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_db_session)):
+async def login_form(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db_session)):
     """
         Autentica um usuário utilizando OAuth2 Password Flow.
 
@@ -213,7 +282,7 @@ async def login_form(form_data: OAuth2PasswordRequestForm = Depends(), session:
         Args:
             form_data (OAuth2PasswordRequestForm): Dados do formulário OAuth2
                 contendo username (e-mail) e password.
-            session (Session): Sessão ativa do SQLAlchemy.
+            session (AsyncSession): Sessão ativa do SQLAlchemy.
 
         Raises:
             HTTPException:
@@ -222,20 +291,20 @@ async def login_form(form_data: OAuth2PasswordRequestForm = Depends(), session:
         Returns:
             dict: Access token JWT e tipo do token para autenticação Bearer.
     """
-    user = authentic_user(email=form_data.username, senha=form_data.password, session=session)
-    if not user:
+    id_usuario = await authentic_user(email=form_data.username, senha=form_data.password, session=session)
+    if not id_usuario:
         # Usuario nao cadastrado ou senha errada
         raise HTTPException(status_code=400, detail=INVALID_PWD_MESSAGE)
 
 
     # Usuario existe, entao criando access e refresh token para o usuario
-    access_token = create_token_jwt(id_usuario=user.id)
+    access_token = create_token_jwt(id_usuario=id_usuario)
 
     # Passando o parametro duracao_token para o refresh token como sendo 7 dias.
     # esse parametro por padrao é o valor padrao de ACCESS_TOKEN_EXPIRE_MINUTES na .env
     # Ou seja, a cada 7 dias é preciso logar novamente no sistema e pegar o access_token
     # Mas durante os 7 dias, voce pode usar o refresh token para pegar o access token
-    refresh_token = create_token_jwt(id_usuario=user.id, duracao_token=timedelta(days=7))
+    refresh_token = create_token_jwt(id_usuario=id_usuario, duracao_token=timedelta(days=7))
 
     return {
         "message": SUCCESSFULL_AUTH_USER_MESSAGE,
@@ -246,7 +315,7 @@ async def login_form(form_data: OAuth2PasswordRequestForm = Depends(), session:
 # Gerando uma nova rota para pegar um novo access token via refresh token
 # Criando uma função dependente (Depends) e adicionando a função use_refresh_token
 @autenticacao_rota.get("/refresh")
-async def use_refresh_token(user: Usuario = Depends(verify_token)):
+async def use_refresh_token(user: UsuarioAutenticado = Depends(verify_token)):
     """
         Gera um novo access token a partir de um token válido.
 
@@ -255,7 +324,7 @@ async def use_refresh_token(user: Usuario = Depends(verify_token)):
         atual ainda seja válido.
 
         Args:
-            user (Usuario): Usuário autenticado obtido a partir do token JWT.
+            user (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Returns:
             dict: Novo access token JWT e tipo do token.
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import os
+from collections import defaultdict
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.templating import Jinja2Templates
-from dependencies import get_db_session, verify_token
+from dependencies import get_db_session, verify_token, UsuarioAutenticado
 from schemas.schemas import PedidoSchema, ItemPedidoSchema, ResponsePedidoEspecificoSchema
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-from models.models import Pedido, Usuario, ItensPedido
+from pydantic import TypeAdapter
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from models.models import Pedido, ItensPedido
 from typing import List
 
 # Adicionada a rota, a tag para a documentação e a dependencia em "dependencies"
@@ -12,45 +17,89 @@ from typing import List
 # com autenticação do usuario
 pedidos_rota = APIRouter(prefix="/pedidos", tags=["Pedidos"], dependencies=[Depends(verify_token)])
 
+# Criando o TypeAdapter da lista de pedidos uma unica vez, ao importar o modulo, para o Pydantic nao
+# montar o validador/serializador da lista a cada requisição da rota orders_list_user
+_PEDIDOS_ADAPTER = TypeAdapter(List[ResponsePedidoEspecificoSchema])
+
 # Configurando um template html para a pagina inicial de rotas, configuração com Jinja2 como template engine
 templates = Jinja2Templates(directory="templates")
 
+# Em produção os templates nao mudam, entao o Jinja2 nao precisa checar a data de modificação do arquivo a cada render.
+# O orders.html ja é compilado aqui na importação, assim a primeira requisição de cada worker nao paga a compilação.
+if os.getenv("ENV") == "prod":
+    templates.env.auto_reload = False
+templates.get_template("orders.html")
+
+# Função que recalcula o valor total do pedido direto no banco
+async def recalc_total(session, pedido_id):
+    """
+        Recalcula o valor total de um pedido com base nos seus itens.
+
+        Executa um unico UPDATE com a soma de valor * quantidade dos itens
+        numa subquery, sem trazer os itens do banco para o Python. Os itens
+        novos ou removidos precisam ter sido enviados ao banco (flush) antes.
+
+        Args:
+            pedido_id (int): Identificador único do pedido.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+    """
+    subquery_total = (
+        select(func.coalesce(func.sum(ItensPedido.valor * ItensPedido.quantidade), 0.0))
+        .where(ItensPedido.pedido == pedido_id)
+        .scalar_subquery()
+    )
+
+    # O pedido carregado na sessão nao é sincronizado aqui, quem chama a função faz o refresh do valor se precisar dele
+    await session.execute(
+        update(Pedido).where(Pedido.id == pedido_id).values(valor=subquery_total),
+        execution_options={"synchronize_session": False}
+    )
+
 @pedidos_rota.get(path="/", status_code=201)
 async def orders():
     return {"message": "rotas pedidos"}
 
 @pedidos_rota.get(path="/listar-pedidos", status_code=201)
-async def orders_list(session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+async def orders_list(limit: int = Query(50, ge=1, le=200), after_id: int | None = None, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
-        Lista todos os pedidos cadastrados no sistema.
+        Lista os pedidos cadastrados no sistema de forma paginada.
 
         Esta rota é restrita a usuários administradores. Realiza a validação
         do token JWT e verifica se o usuário autenticado possui permissão
         de administrador antes de retornar os pedidos.
+        A paginação é feita por keyset: os pedidos vem ordenados pelo id e a
+        próxima página é pedida passando o id do ultimo pedido recebido em `after_id`.
 
         Args:
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
-            usuario (Usuario): Usuário autenticado obtido a partir do token JWT.
+            limit (int): Quantidade maxima de pedidos retornados (1 a 200, padrão 50).
+            after_id (int | None): Retorna apenas os pedidos com id maior que esse valor.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            usuario (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
                 - 401: Caso o usuário autenticado não possua permissão de administrador.
 
         Returns:
-            list[Pedido]: Lista contendo todos os pedidos registrados no sistema.
+            list[Pedido]: Lista com uma pagina dos pedidos registrados no sistema.
     """
     # Verificando se o usuario é admin
     if not usuario.admin:
         raise HTTPException(status_code=401, detail="Você não tem permissão para acessar essa funcionalidade.")
 
-    # Pegando todos os pedidos
-    pedidos = session.query(Pedido).all()
+    # Pegando uma pagina de pedidos. Com o filtro "id > after_id" o banco usa o indice da chave primaria
+    # para pular direto para a pagina, sem ler e descartar as linhas anteriores como o OFFSET faz
+    query_pedidos = select(Pedido).order_by(Pedido.id).limit(limit)
+    if after_id is not None:
+        query_pedidos = query_pedidos.where(Pedido.id > after_id)
+
+    pedidos = (await session.scalars(query_pedidos)).all()
 
     return pedidos
 
 # Configurando a classe de resposta da rota como HTMLResponse para renderizar um html na resposta.
 @pedidos_rota.get(path="/listar-html", status_code=201)
-async def orders_html(request: Request, session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+async def orders_html(request: Request, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
         Renderiza uma página HTML com a listagem de pedidos do sistema.
 
@@ -61,8 +110,8 @@ async def orders_html(request: Request, session: Session = Depends(get_db_sessio
         Args:
             request (Request): Objeto de requisição do FastAPI necessário
                 para renderização do TemplateResponse.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
-            usuario (Usuario): Usuário autenticado obtido a partir do token JWT.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            usuario (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
@@ -76,25 +125,27 @@ async def orders_html(request: Request, session: Session = Depends(get_db_sessio
     if not usuario.admin:
         raise HTTPException(status_code=401, detail="Você não tem permissão para acessar essa funcionalidade.")
 
-    # Pegando todos os pedidos do banco de dados
-    query_select_all = select(Pedido)
+    # Pegando todos os pedidos do banco de dados numa unica query
+    pedidos = (await session.scalars(select(Pedido))).all()
 
-    # Executa e transforma numa lista para retorno
-    pedidos = session.execute(query_select_all).scalars().all()
+    # Separando os pedidos por status numa unica passada pela lista
+    pedidos_por_status = defaultdict(list)
+    for pedido in pedidos:
+        pedidos_por_status[pedido.status].append(pedido)
 
     # Configurando o retorno em HTM Response usando o Template Response e referenciando o arquivo .html que temos na pasta templates.
     return templates.TemplateResponse(
         "orders.html",
         {
             "request": request,
-            "pendentes": [p for p in pedidos if p.status == "PENDENTE"],
-            "finalizados": [pf for pf in pedidos if pf.status == "FINALIZADO"],
-            "cancelados": [pc for pc in pedidos if pc.status == "CANCELADO"],
+            "pendentes": pedidos_por_status["PENDENTE"],
+            "finalizados": pedidos_por_status["FINALIZADO"],
+            "cancelados": pedidos_por_status["CANCELADO"],
         }
     )
 
 @pedidos_rota.post(path="/pedido", status_code=201)
-async def create_order(pedido_schema: PedidoSchema, session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+async def create_order(pedido_schema: PedidoSchema, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
         Cria um novo pedido no sistema.
 
@@ -104,10 +155,10 @@ async def create_order(pedido_schema: PedidoSchema, session: Session = Depends(g
 
         Args:
             pedido_schema (PedidoSchema): Dados do pedido validados pelo Pydantic.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
 
         Returns:
-            dict: Mensagem de sucesso contendo o ID do pedido criado.
+            ORJSONResponse: Mensagem de sucesso contendo o ID do pedido criado.
     """
     new_order = Pedido(usuario=pedido_schema.usuario, nome_usuario=pedido_schema.nome_usuario)
 
@@ -115,13 +166,14 @@ async def create_order(pedido_schema: PedidoSchema, session: Session = Depends(g
         raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa modificação")
 
     session.add(new_order)
-    session.commit()
+    await session.commit()
 
-    return {"message": f"Pedido criado com sucesso: {new_order.id}"}
+    # Retornando o ORJSONResponse direto, a resposta é um dicionario simples e nao precisa passar pelo jsonable_encoder
+    return ORJSONResponse({"message": f"Pedido criado com sucesso: {new_order.id}"}, status_code=201)
 
 # Criando rota de cancelamento de pedido
 @pedidos_rota.post("/pedido/cancelar/{id_pedido}")
-async def cancel_order(id_pedido: int, session: Session = Depends(get_db_session), user: Usuario = Depends(verify_token)):
+async def cancel_order(id_pedido: int, session: AsyncSession = Depends(get_db_session), user: UsuarioAutenticado = Depends(verify_token)):
     """
         Cancela um pedido existente no sistema.
 
@@ -132,8 +184,8 @@ async def cancel_order(id_pedido: int, session: Session = Depends(get_db_session
 
         Args:
             id_pedido (int): Identificador único do pedido a ser cancelado.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
-            user (Usuario): Usuário autenticado obtido a partir do token JWT.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            user (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
@@ -143,8 +195,9 @@ async def cancel_order(id_pedido: int, session: Session = Depends(get_db_session
         Returns:
             dict: Mensagem de sucesso e dados do pedido cancelado.
     """
-    # Pegando o pedido de acordo com o ID dentro do banco de dados
-    pedido = session.query(Pedido).filter(Pedido.id == id_pedido).first()
+    # Pegando so as colunas do pedido usadas na verificação e na resposta, sem carregar o objeto do ORM
+    query_pedido = select(Pedido.id, Pedido.usuario, Pedido.nome_usuario, Pedido.valor).where(Pedido.id == id_pedido)
+    pedido = (await session.execute(query_pedido)).first()
 
     # Verificando se o pedido existe ou nao para cancelar.
     if not pedido:
@@ -155,21 +208,22 @@ async def cancel_order(id_pedido: int, session: Session = Depends(get_db_session
     if not user.admin and user.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa modificação")
 
-    # Alterando o status do pedido para cancelado
-    pedido.status = "CANCELADO"
+    # Alterando o status do pedido para cancelado direto com UPDATE
+    query_cancelar = update(Pedido).where(Pedido.id == id_pedido).values(status="CANCELADO")
+    await session.execute(query_cancelar, execution_options={"synchronize_session": False})
 
     # Dando commit para o pedido ser salvo como cancelado no banco
-    session.commit()
+    await session.commit()
 
     return {
         "mensagem": f"Pedido Nº {pedido.id} cancelado com sucesso",
-        "pedido": pedido
+        "pedido": {**pedido._asdict(), "status": "CANCELADO"}
     }
 
 
 # Criando a rota de adicionar ITENS ao PEDIDO (Uma pizza pode ter sabor mussarela, e etc)
 @pedidos_rota.post("/pedido/adicionar-item/{id_pedido}")
-async def add_item_order(id_pedido: int, item_schema: ItemPedidoSchema, session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+async def add_item_order(id_pedido: int, item_schema: ItemPedidoSchema, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
         Adiciona um item a um pedido existente.
 
@@ -181,8 +235,8 @@ async def add_item_order(id_pedido: int, item_schema: ItemPedidoSchema, session:
         Args:
             id_pedido (int): Identificador único do pedido.
             item_schema (ItemPedidoSchema): Dados do item a ser adicionado ao pedido.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
-            usuario (Usuario): Usuário autenticado obtido a partir do token JWT.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            usuario (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
@@ -190,9 +244,9 @@ async def add_item_order(id_pedido: int, item_schema: ItemPedidoSchema, session:
                 - 401: Caso o usuário não tenha permissão para modificar o pedido.
 
         Returns:
-            dict: Mensagem de sucesso, ID do item criado e valor atualizado do pedido.
+            ORJSONResponse: Mensagem de sucesso, ID do item criado e valor atualizado do pedido.
     """
-    pedido = session.query(Pedido).filter(Pedido.id == id_pedido).first()
+    pedido = await session.get(Pedido, id_pedido)
     if not pedido:
         raise HTTPException(status_code=400, detail="Pedido não encontrado.")
 
@@ -203,20 +257,25 @@ async def add_item_order(id_pedido: int, item_schema: ItemPedidoSchema, session:
 
     session.add(new_item_order)
 
-    # Atualizando o preço do pedido
-    pedido.calculate_price()
+    # Enviando o novo item para o banco antes de recalcular o preço, a sessão não faz autoflush
+    await session.flush()
 
-    session.commit()
+    # Atualizando o preço do pedido e relendo so o valor calculado pelo banco
+    await recalc_total(session, pedido.id)
+    await session.refresh(pedido, ["valor"])
 
-    return {
+    await session.commit()
+
+    # Retornando o ORJSONResponse direto, a resposta é um dicionario simples e nao precisa passar pelo jsonable_encoder
+    return ORJSONResponse({
         "message": "Item adicionado com sucesso!",
         "item_id": new_item_order.id,
         "preco_pedido": pedido.valor
-    }
+    })
 
 # Rota para remoção de um item de um pedido especifico.
 @pedidos_rota.post("/pedido/remover-item/{id_item_pedido}")
-async def remove_item_order(id_item_pedido: int, session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+async def remove_item_order(id_item_pedido: int, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
         Remove um item específico de um pedido.
 
@@ -226,8 +285,8 @@ async def remove_item_order(id_item_pedido: int, session: Session = Depends(get_
 
         Args:
             id_item_pedido (int): Identificador único do item do pedido.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
-            usuario (Usuario): Usuário autenticado obtido a partir do token JWT.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            usuario (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
@@ -235,42 +294,53 @@ async def remove_item_order(id_item_pedido: int, session: Session = Depends(get_
                 - 401: Caso o usuário não tenha permissão para modificar o pedido.
 
         Returns:
-            dict: Mensagem de sucesso, ID do item removido, quantidade
-            de itens restantes no pedido e resumo atualizado do pedido.
+            ORJSONResponse: Mensagem de sucesso, ID do item removido, novo valor
+            total do pedido e quantidade de itens restantes no pedido.
     """
-    # Pegando o item do pedido de acordo com o id do item
-    item_pedido = session.query(ItensPedido).filter(ItensPedido.id == id_item_pedido).first()
+    # Pegando o item do pedido junto com o seu pedido numa unica query (JOIN), o pedido é usado
+    # para verificar se aquele usuario é dono daquele pedido
+    query_item = select(ItensPedido).options(joinedload(ItensPedido.pedido_rel)).where(ItensPedido.id == id_item_pedido)
+    item_pedido = await session.scalar(query_item)
 
-    # Pegando o pedido para verificar se aquele usuario é dono daquele pedido
-    # e para mostrar na resposta os itens que ainda estao no pedido
-    pedido = session.query(Pedido).filter(Pedido.id==item_pedido.pedido).first()
-
-    # Se nao existir pedido, retorna erro
+    # Se nao existir o item, retorna erro
     if not item_pedido:
         raise HTTPException(status_code=400, detail="Item do pedido não encontrado!")
 
+    pedido = item_pedido.pedido_rel
+
     # Se o usuario nao for admin ou o pedido nao for dele, retornar erro para o usuario
     if not usuario.admin and usuario.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa modificação")
 
     # Deletando o pedido no banco
-    session.delete(item_pedido)
-    # Calculando o novo preço do pedido com a função de calcular o preço
-    pedido.calculate_price()
+    await session.delete(item_pedido)
+    # Enviando a remoção para o banco antes de recalcular o preço, a sessão não faz autoflush
+    await session.flush()
+    # Calculando o novo preço do pedido com a função de recalcular o total
+    await recalc_total(session, pedido.id)
+
+    # Pegando a quantidade de itens que ficaram no pedido e o novo total numa unica query, sem carregar os itens
+    query_resumo = (
+        select(func.count(), func.coalesce(func.sum(ItensPedido.valor * ItensPedido.quantidade), 0.0))
+        .where(ItensPedido.pedido == pedido.id)
+    )
+    itens_restantes, novo_total = (await session.execute(query_resumo)).one()
+
     # Commitando (Executando) as alterações no banco de dados
-    session.commit()
+    await session.commit()
 
-    return {
+    # O cliente pode buscar o pedido completo na rota de visualizar pedido se precisar dele
+    return ORJSONResponse({
         "message": "Item removido com sucesso!",
         "item_id": item_pedido.id,
-        "quantidade_itens_pedido": len(pedido.itens),
-        "resumo_pedido": pedido
-    }
+        "novo_total": float(novo_total),
+        "itens_restantes": itens_restantes
+    })
 
 
 # Rota para finalização de um pedido
 @pedidos_rota.post("/pedido/finalizar/{id_pedido}")
-async def finalize_order(id_pedido: int, session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+async def finalize_order(id_pedido: int, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
         Finaliza um pedido existente no sistema.
 
@@ -279,8 +349,8 @@ async def finalize_order(id_pedido: int, session: Session = Depends(get_db_sessi
 
         Args:
             id_pedido (int): Identificador único do pedido a ser finalizado.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
-            usuario (Usuario): Usuário autenticado obtido a partir do token JWT.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            usuario (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
@@ -290,8 +360,9 @@ async def finalize_order(id_pedido: int, session: Session = Depends(get_db_sessi
         Returns:
             dict: Mensagem de sucesso e resumo do pedido finalizado.
     """
-    # Pega o pedido especifico
-    pedido = session.query(Pedido).filter(id_pedido == Pedido.id).first()
+    # Pega so as colunas do pedido usadas na verificação e na resposta, sem carregar o objeto do ORM
+    query_pedido = select(Pedido.id, Pedido.usuario, Pedido.nome_usuario, Pedido.valor).where(Pedido.id == id_pedido)
+    pedido = (await session.execute(query_pedido)).first()
 
     # Verifica se o pedido não existe
     if not pedido:
@@ -301,18 +372,20 @@ async def finalize_order(id_pedido: int, session: Session = Depends(get_db_sessi
     if not usuario.admin and usuario.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa modificação")
 
-    pedido.status = "FINALIZADO"
-    session.commit()
+    # Finalizando o pedido direto com UPDATE
+    query_finalizar = update(Pedido).where(Pedido.id == id_pedido).values(status="FINALIZADO")
+    await session.execute(query_finalizar, execution_options={"synchronize_session": False})
+    await session.commit()
 
     return {
         "message": f"Pedido {pedido.id} finalizado com sucesso!",
-        "resumo_pedido": pedido
+        "resumo_pedido": {**pedido._asdict(), "status": "FINALIZADO"}
     }
 
 
 # Rota para visualizar UM pedido especifico
 @pedidos_rota.get("/pedido/{id_pedido}")
-async def get_order(id_pedido: int, session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+async def get_order(id_pedido: int, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
         Retorna os dados de um pedido específico.
 
@@ -322,8 +395,8 @@ async def get_order(id_pedido: int, session: Session = Depends(get_db_session),
 
         Args:
             id_pedido (int): Identificador único do pedido.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
-            usuario (Usuario): Usuário autenticado obtido a partir do token JWT.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            usuario (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
@@ -333,60 +406,80 @@ async def get_order(id_pedido: int, session: Session = Depends(get_db_session),
         Returns:
             dict: Informações do pedido, incluindo total de itens e resumo completo.
     """
-    # Pega o pedido especificado
-    pedido = session.query(Pedido).filter(Pedido.id == id_pedido).first()
+    # Pega o pedido especificado ja com os itens (LEFT JOIN com joinedload), que sao usados no resumo do pedido.
+    # Se o usuario nao for admin, a permissão ja entra no WHERE (so o dono do pedido), tudo numa unica query
+    query_pedido = select(Pedido).options(joinedload(Pedido.itens)).where(Pedido.id == id_pedido)
+    if not usuario.admin:
+        query_pedido = query_pedido.where(Pedido.usuario == usuario.id)
 
-    # Verificando se o pedido nao existe
+    pedido = (await session.execute(query_pedido)).unique().scalar_one_or_none()
+
+    # Se nao veio o pedido, um EXISTS diz se ele nao existe ou se o usuario nao tem permissao para acessar esse pedido
     if not pedido:
-        raise HTTPException(status_code=400, detail="O pedido especificado não existe.")
+        pedido_existe = await session.scalar(select(select(Pedido.id).where(Pedido.id == id_pedido).exists()))
+        if not pedido_existe:
+            raise HTTPException(status_code=400, detail="O pedido especificado não existe.")
 
-    # Verificando se o usuario não tem permissao para acessar esse pedido
-    # admin ou dono do pedido
-    if not usuario.admin and usuario.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa requisição")
 
     return {
         "message": "Pedido resgatado",
         "pedido_id": pedido.id,
-        "total_itens_pedido": len(pedido.itens), # Fazendo isso para o lazyloaded carregar todos os itens do pedido
+        "total_itens_pedido": len(pedido.itens),
         "resumo_pedido": pedido,
     }
 
 # visualizar todos os pedidos de 1 usuario especifico e retornando o schema de response pedidos
-# Utilizando o response_model para passar o schema do pedido que deve ser retornado
-@pedidos_rota.get(path="pedido/listar-pedidos-usuario/{id_usuario}", response_model=List[ResponsePedidoEspecificoSchema])
-async def orders_list_user(id_usuario: int, session: Session = Depends(get_db_session), usuario: Usuario = Depends(verify_token)):
+# A serialização é feita pelo _PEDIDOS_ADAPTER, o schema fica no "responses" so para a documentação
+@pedidos_rota.get(path="/pedido/listar-pedidos-usuario/{id_usuario}", responses={200: {"model": List[ResponsePedidoEspecificoSchema]}})
+async def orders_list_user(id_usuario: int, session: AsyncSession = Depends(get_db_session), usuario: UsuarioAutenticado = Depends(verify_token)):
     """
         Lista todos os pedidos de um usuário específico.
 
         A rota retorna os pedidos vinculados a um usuário informado.
         O acesso é restrito ao próprio usuário ou a administradores.
-        O retorno segue o schema definido no response_model.
+        O retorno é validado e serializado com o ResponsePedidoEspecificoSchema
+        pelo TypeAdapter do modulo e enviado como ORJSONResponse.
 
         Args:
             id_usuario (int): Identificador único do usuário.
-            session (Session): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
-            usuario (Usuario): Usuário autenticado obtido a partir do token JWT.
+            session (AsyncSession): Sessão ativa do SQLAlchemy para acesso ao banco de dados.
+            usuario (UsuarioAutenticado): Usuário autenticado obtido a partir do token JWT.
 
         Raises:
             HTTPException:
                 - 401: Caso o usuário não tenha permissão para acessar os pedidos.
 
         Returns:
-            List[ResponsePedidoEspecificoSchema]: Lista de pedidos do usuário.
+            ORJSONResponse: Lista de pedidos do usuário no formato do ResponsePedidoEspecificoSchema.
     """
-    # Pega todos os pedidos de um usuario especifico
-    pedidos = session.query(Pedido).filter(Pedido.usuario == id_usuario).all()
-
     # Fazendo a verificação se o usuario tem permissão para acessar os pedidos desse ID
+    # antes de qualquer query, assim um acesso sem permissão nao custa nenhuma ida ao banco
     if not usuario.admin and usuario.id != id_usuario:
         raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa requisição")
 
-    return pedidos
-
-    # Não é possivel utilizar a resposta abaixo porque o Pydantic esta validando com o Schema de pedidos especificos
-    # return {
-    #     "message": "Pedidos resgatados",
-    #     "quantidade_pedidos": len(pedidos),
-    #     "pedidos": pedidos
-    # }
+    # Pega todos os pedidos de um usuario especifico, do mais novo para o mais antigo, selecionando so as colunas
+    # que o schema de resposta usa. As linhas vem como tuplas, sem montar os objetos do ORM.
+    # O filtro e a ordenação sao atendidos pelo indice ix_orders_usuario_id (usuario, id DESC)
+    query_pedidos = (
+        select(Pedido.id, Pedido.status, Pedido.nome_usuario, Pedido.valor)
+        .where(Pedido.usuario == id_usuario)
+        .order_by(Pedido.id.desc())
+    )
+    pedidos = (await session.execute(query_pedidos)).all()
+
+    # Pegando os itens de todos os pedidos numa unica query (WHERE pedido IN (...)) e separando por pedido
+    itens_por_pedido = defaultdict(list)
+    if pedidos:
+        query_itens = (
+            select(ItensPedido.pedido, ItensPedido.nome, ItensPedido.valor, ItensPedido.peso, ItensPedido.quantidade, ItensPedido.sabor)
+            .where(ItensPedido.pedido.in_([pedido.id for pedido in pedidos]))
+        )
+        for item in await session.execute(query_itens):
+            itens_por_pedido[item.pedido].append(item._asdict())
+
+    # Montando os pedidos com os seus itens, validando com o schema e transformando em tipos JSON, o orjson so escreve o JSON final
+    pedidos_validados = _PEDIDOS_ADAPTER.validate_python(
+        [{**pedido._asdict(), "itens": itens_por_pedido[pedido.id]} for pedido in pedidos]
+    )
+    return ORJSONResponse(_PEDIDOS_ADAPTER.dump_python(pedidos_validados, mode="json"))
@@ -1,5 +1,5 @@
 # Arquivo de schemas é usado com o Pydantic para definir oque cada item e classe necessita para criação de usuario e outras adições
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 
 # Esquema do Pydantic para o Usuario, qualquer interação tem que seguir esse esquema, principalmente adição de novos.
@@ -10,11 +10,11 @@ class UsuarioSchema(BaseModel):
     telefone: str
     sexo: Optional[str]
     admin: Optional[bool]
-    ativo : Optional[bool]
+    # O campo ativo é obrigatorio no banco (NOT NULL), entao nao pode ser enviado como null
+    ativo: bool
 
-    # Criando a classe Config para dizer que essa classe de Schema sera uma classe ORM e nao um dicionario PY
-    class Config:
-        from_attributes = True
+    # Criando o model_config para dizer que essa classe de Schema sera uma classe ORM e nao um dicionario PY
+    model_config = ConfigDict(from_attributes=True)
 
 # Esquema para pedidos
 class PedidoSchema(BaseModel):
@@ -23,8 +23,7 @@ class PedidoSchema(BaseModel):
     valor: Optional[float]
     status: Optional[str]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Esquema para login na API
@@ -32,8 +31,7 @@ class LoginSchema(BaseModel):
     email: str
     senha: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ItemPedidoSchema(BaseModel):
@@ -43,8 +41,7 @@ class ItemPedidoSchema(BaseModel):
     quantidade: int
     sabor: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Schema para resposta da requisiçaõ para a rota de orders_list_user.
@@ -55,5 +52,4 @@ class ResponsePedidoEspecificoSchema(BaseModel):
     valor: float
     itens: List[ItemPedidoSchema]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)